@@ -1,6 +1,13 @@
+import asyncio
+import hashlib
+import io
+import os
+import aiohttp
 import pandas as pd
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -42,6 +49,18 @@ COLUNAS_SCR = [
     "ativo_problematico", "carteira_vencida",
 ]
 
+# Dimensões de baixa cardinalidade: category acelera groupby/filtros e reduz RAM
+COLUNAS_CATEGORICAS_SCR = ["uf", "modalidade", "submodalidade", "segmento", "porte"]
+
+# Cache compartilhado (Redis) — sobrevive a restarts do Streamlit.
+# Sem REDIS_URL definido, as funções caem direto no cache por processo.
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TTL_PTAX = 3600
+REDIS_TTL_STALE = 7 * 24 * 3600
+# Só frames pequenos (PTAX) vão para o Redis; acima disso não compensa
+# serializar nem trafegar com socket_timeout=2.
+REDIS_MAX_PAYLOAD = 8 * 1024 * 1024
+
 
 # ==============================
 # HELPERS GERAIS
@@ -66,6 +85,18 @@ def _fmt_mmddyyyy(d: date) -> str:
     return d.strftime("%m-%d-%Y")
 
 
+def _df_para_parquet_bytes(df: pd.DataFrame) -> bytes | None:
+    # Parquet zstd: 5-10x menor que o CSV e gerado direto em C++ (sem string Python).
+    # Colunas object com tipos misturados não viram Arrow: sem botão Parquet nesse caso.
+    import pyarrow as pa
+    buf = io.BytesIO()
+    try:
+        df.to_parquet(buf, index=False, compression="zstd")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        return None
+    return buf.getvalue()
+
+
 # FIX: @st.cache_resource para s3fs.S3FileSystem.
 # @st.cache_data tenta serializar (pickle) — s3fs não é serializável
 # e causa TypeError/crash no startup. cache_resource mantém o objeto
@@ -75,6 +106,89 @@ def _get_anon_fs() -> s3fs.S3FileSystem:
     return s3fs.S3FileSystem(anon=True, client_kwargs={"region_name": S3_REGION})
 
 
+# Sessão HTTP única (keep-alive + pool do urllib3) para as APIs do BCB.
+# requests.get() abre uma conexão TCP+TLS nova a cada chamada; com a sessão
+# em @st.cache_resource, reruns e cliques em "Consultar" reaproveitam a conexão.
+@st.cache_resource
+def _get_http_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    session.headers.update({"Accept": "application/json", "User-Agent": "painel-bcb/1.0"})
+    return session
+
+
+@st.cache_resource
+def _get_redis():
+    if not REDIS_URL:
+        return None
+    try:
+        import redis
+        r = redis.Redis.from_url(REDIS_URL, socket_timeout=2)
+        r.ping()
+        return r
+    except Exception:
+        return None
+
+
+def _df_para_ipc(df: pd.DataFrame):
+    # devolve o pa.Buffer do stream IPC (sem to_pybytes: evita mais uma cópia)
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _df_de_ipc(payload: bytes) -> pd.DataFrame:
+    import pyarrow as pa
+    return pa.ipc.open_stream(payload).read_pandas()
+
+
+def _cache_df(nome: str, args: tuple, ttl: int, fn) -> pd.DataFrame:
+    """
+    Cache de DataFrames no Redis (Arrow IPC), chaveado por SHA1 de (nome, args).
+    Mantém também uma cópia "stale" de TTL longo, usada se a origem falhar.
+    Payloads acima de REDIS_MAX_PAYLOAD não são gravados.
+    """
+    r = _get_redis()
+    if r is None:
+        return fn()
+
+    key = "painel-bcb:" + hashlib.sha1(repr((nome, args)).encode("utf-8")).hexdigest()
+    try:
+        payload = r.get(key)
+        if payload:
+            return _df_de_ipc(payload)
+    except Exception:
+        pass
+
+    try:
+        df = fn()
+    except Exception:
+        try:
+            stale = r.get(key + ":stale")
+        except Exception:
+            stale = None
+        if stale:
+            return _df_de_ipc(stale)
+        raise
+
+    if not df.empty:
+        try:
+            buf = _df_para_ipc(df)
+            if buf.size <= REDIS_MAX_PAYLOAD:
+                payload = memoryview(buf)
+                pipe = r.pipeline()
+                pipe.setex(key, ttl, payload)
+                pipe.setex(key + ":stale", REDIS_TTL_STALE, payload)
+                pipe.execute()
+        except Exception:
+            pass
+    return df
+
+
 # ==============================
 # LEITURA S3 (normalização de schema)
 # ==============================
@@ -137,8 +251,12 @@ def _normalizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
         df["ano"] = pd.to_numeric(df["ano"], errors="coerce").astype("Int64")
     if "mes" in df.columns:
         df["mes"] = pd.to_numeric(df["mes"], errors="coerce").astype("Int64")
-    if "data_base" in df.columns:
+    # parquet processado já traz data_base como datetime64: evita reparse O(n)
+    if "data_base" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["data_base"]):
         df["data_base"] = pd.to_datetime(df["data_base"], errors="coerce")
+    for c in COLUNAS_CATEGORICAS_SCR:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
     return df
 
 
@@ -194,19 +312,52 @@ def carregar_scr_parquet_publico(ano: int) -> pd.DataFrame:
 # ==============================
 # PTAX
 # ==============================
-@st.cache_data(ttl=3600)
-def cotacao_dolar_periodo_df(data_ini: date, data_fim: date) -> pd.DataFrame:
-    url = f"{PTAX_BASE}/CotacaoDolarPeriodo(dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao)"
+PTAX_URL = f"{PTAX_BASE}/CotacaoDolarPeriodo(dataInicial=@dataInicial,dataFinalCotacao=@dataFinalCotacao)"
+
+
+def _intervalos_por_ano(data_ini: date, data_fim: date) -> list:
+    return [
+        (max(data_ini, date(ano, 1, 1)), min(data_fim, date(ano, 12, 31)))
+        for ano in range(data_ini.year, data_fim.year + 1)
+    ]
+
+
+async def _fetch_ptax_intervalo(session: aiohttp.ClientSession, ini: date, fim: date) -> list:
     params = {
-        "@dataInicial": f"'{_fmt_mmddyyyy(data_ini)}'",
-        "@dataFinalCotacao": f"'{_fmt_mmddyyyy(data_fim)}'",
+        "@dataInicial": f"'{_fmt_mmddyyyy(ini)}'",
+        "@dataFinalCotacao": f"'{_fmt_mmddyyyy(fim)}'",
         "$format": "json",
         "$select": "cotacaoCompra,cotacaoVenda,dataHoraCotacao",
         "$top": 10000,
     }
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    df = pd.DataFrame(r.json().get("value", []))
+    async with session.get(PTAX_URL, params=params) as r:
+        r.raise_for_status()
+        payload = await r.json(content_type=None)
+    return payload.get("value", [])
+
+
+# Uma requisição por ano, disparadas em paralelo: períodos longos deixam de
+# somar a latência de cada ano (e não esbarram no limite de $top=10000).
+async def _fetch_ptax_periodo(data_ini: date, data_fim: date) -> list:
+    connector = aiohttp.TCPConnector(limit=8)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers={"Accept": "application/json"}) as session:
+        partes = await asyncio.gather(*[
+            _fetch_ptax_intervalo(session, ini, fim)
+            for ini, fim in _intervalos_por_ano(data_ini, data_fim)
+        ])
+    return [linha for parte in partes for linha in parte]
+
+
+@st.cache_data(ttl=3600)
+def cotacao_dolar_periodo_df(data_ini: date, data_fim: date) -> pd.DataFrame:
+    return _cache_df("cotacao_dolar_periodo_df", (data_ini, data_fim), REDIS_TTL_PTAX,
+                     lambda: _cotacao_dolar_periodo_api(data_ini, data_fim))
+
+
+def _cotacao_dolar_periodo_api(data_ini: date, data_fim: date) -> pd.DataFrame:
+    df = pd.DataFrame(asyncio.run(_fetch_ptax_periodo(data_ini, data_fim)))
     if df.empty:
         return df
     df["dataHoraCotacao"] = pd.to_datetime(df["dataHoraCotacao"])
@@ -216,11 +367,15 @@ def cotacao_dolar_periodo_df(data_ini: date, data_fim: date) -> pd.DataFrame:
 def dolar_diario(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
-    d = df.copy()
-    d["dia"] = d["dataHoraCotacao"].dt.date
-    d = d.groupby("dia", as_index=False)[["cotacaoCompra", "cotacaoVenda"]].mean()
-    d["dia"] = pd.to_datetime(d["dia"])
-    return d
+    # resample("D") agrupa direto no datetime64 (sem coluna object de datetime.date);
+    # dias sem cotação (fins de semana/feriados) saem no dropna.
+    return (
+        df.set_index("dataHoraCotacao")
+        .resample("D")[["cotacaoCompra", "cotacaoVenda"]].mean()
+        .dropna(how="all")
+        .rename_axis("dia")
+        .reset_index()
+    )
 
 
 # ==============================
@@ -231,7 +386,7 @@ def carregar_serie_bcb(serie: int, data_ini: str, data_fim: str) -> pd.DataFrame
     url = BCB_SERIES_BASE.format(serie=serie)
     params = {"formato": "json", "dataInicial": data_ini, "dataFinal": data_fim}
     try:
-        r = requests.get(url, params=params, timeout=30)
+        r = _get_http_session().get(url, params=params, timeout=30)
         r.raise_for_status()
         df = pd.DataFrame(r.json())
         if df.empty:
@@ -251,6 +406,20 @@ def _periodo_para_sgsdates(data_ini: date, data_fim: date):
 # ==============================
 # AGREGAÇÕES SCR
 # ==============================
+def _agregar_coluna_arrow(df: pd.DataFrame, col: str, funcao: str):
+    """
+    Soma/média de uma coluna via pyarrow.compute, ignorando nulos/NaN,
+    sem criar Series intermediárias (to_numeric + fillna/dropna).
+    Retorna None se não houver valores válidos.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    arr = pa.array(df[col], from_pandas=True)
+    if not (pa.types.is_integer(arr.type) or pa.types.is_floating(arr.type)):
+        arr = pa.array(pd.to_numeric(df[col], errors="coerce"), from_pandas=True)
+    return getattr(pc, funcao)(arr).as_py()
+
+
 def agregar_inadimplencia_por_ano(df: pd.DataFrame) -> pd.DataFrame:
     col_taxa = pick_first_col(df, ["taxa_inadimplencia", "inadimplencia_pct", "pct_inadimplencia"])
     col_ativa = pick_first_col(df, ["carteira_ativa"])
@@ -298,7 +467,7 @@ def agregar_carteira_por_modalidade(df: pd.DataFrame) -> pd.DataFrame:
     if not col_ativa or not col_mod:
         return pd.DataFrame()
     grp = (
-        df.groupby(col_mod)[col_ativa].sum().reset_index()
+        df.groupby(col_mod, observed=True)[col_ativa].sum().reset_index()
         .rename(columns={col_mod: "modalidade", col_ativa: "carteira_ativa"})
         .sort_values("carteira_ativa", ascending=False).head(15)
     )
@@ -316,7 +485,7 @@ def agregar_inadimplencia_por_uf(df: pd.DataFrame) -> pd.DataFrame:
 
     if col_taxa:
         grp = (
-            df.groupby("uf")[col_taxa].mean().reset_index()
+            df.groupby("uf", observed=True)[col_taxa].mean().reset_index()
             .rename(columns={col_taxa: "taxa_inadimplencia"})
             .sort_values("taxa_inadimplencia", ascending=False)
         )
@@ -326,7 +495,7 @@ def agregar_inadimplencia_por_uf(df: pd.DataFrame) -> pd.DataFrame:
         return grp
 
     if col_inad and col_ativa:
-        grp = df.groupby("uf").agg(inad=(col_inad, "sum"), ativa=(col_ativa, "sum")).reset_index()
+        grp = df.groupby("uf", observed=True).agg(inad=(col_inad, "sum"), ativa=(col_ativa, "sum")).reset_index()
         grp["taxa_inadimplencia"] = (grp["inad"] / grp["ativa"].replace(0, np.nan)) * 100
         return grp[["uf", "taxa_inadimplencia"]].sort_values("taxa_inadimplencia", ascending=False)
 
@@ -390,6 +559,10 @@ if fonte == "PTAX (Dólar)":
         st.dataframe(df, use_container_width=True)
         st.download_button("⬇️ Baixar CSV", data=df.to_csv(index=False).encode("utf-8"),
                            file_name="cotacao_dolar_ptax.csv", mime="text/csv")
+        parquet_bytes = _df_para_parquet_bytes(df)
+        if parquet_bytes is not None:
+            st.download_button("⬇️ Baixar Parquet", data=parquet_bytes,
+                               file_name="cotacao_dolar_ptax.parquet", mime="application/octet-stream")
     else:
         st.info("Selecione o período e clique em **Consultar PTAX**.")
 
@@ -428,20 +601,19 @@ elif fonte == "SCR — Indicadores de Crédito":
     c1, c2, c3 = st.columns(3)
 
     if col_ativa:
-        c1.metric("Carteira Ativa Total (R$)", f"{pd.to_numeric(df_scr[col_ativa], errors='coerce').fillna(0).sum():,.0f}")
+        c1.metric("Carteira Ativa Total (R$)", f"{_agregar_coluna_arrow(df_scr, col_ativa, 'sum') or 0:,.0f}")
     else:
         c1.metric("Carteira Ativa Total", "N/D")
 
     if col_inad:
-        c2.metric("Carteira Inadimplente (R$)", f"{pd.to_numeric(df_scr[col_inad], errors='coerce').fillna(0).sum():,.0f}")
+        c2.metric("Carteira Inadimplente (R$)", f"{_agregar_coluna_arrow(df_scr, col_inad, 'sum') or 0:,.0f}")
     else:
         c2.metric("Carteira Inadimplente", "N/D")
 
     # FIX: else alinhado com if col_taxa (e não com if not s.empty)
     if col_taxa:
-        s = pd.to_numeric(df_scr[col_taxa], errors="coerce").dropna()
-        if not s.empty:
-            val = float(s.mean())
+        val = _agregar_coluna_arrow(df_scr, col_taxa, "mean")
+        if val is not None:
             c3.metric("Taxa de Inadimplência Média", f"{val if val > 1.5 else val * 100:.2f}%")
         else:
             c3.metric("Taxa de Inadimplência Média", "N/D")
@@ -532,6 +704,11 @@ elif fonte == "SCR — Indicadores de Crédito":
         st.download_button("⬇️ Baixar amostra (CSV)",
                            data=df_scr.head(50000).to_csv(index=False).encode("utf-8"),
                            file_name=f"scr_{ano_sel}_amostra.csv", mime="text/csv")
+        parquet_bytes = _df_para_parquet_bytes(df_scr.head(50000))
+        if parquet_bytes is not None:
+            st.download_button("⬇️ Baixar amostra (Parquet)", data=parquet_bytes,
+                               file_name=f"scr_{ano_sel}_amostra.parquet",
+                               mime="application/octet-stream")
 
 
 # ==============================================
@@ -590,6 +767,11 @@ elif fonte == "Índices Macroeconômicos":
                                    data=df_idx.to_csv(index=False).encode("utf-8"),
                                    file_name=f"{nome.replace(' ', '_').replace('/', '')}.csv",
                                    mime="text/csv", key=f"dl_{nome}")
+                parquet_bytes = _df_para_parquet_bytes(df_idx)
+                if parquet_bytes is not None:
+                    st.download_button(f"⬇️ Baixar {nome} (Parquet)", data=parquet_bytes,
+                                       file_name=f"{nome.replace(' ', '_').replace('/', '')}.parquet",
+                                       mime="application/octet-stream", key=f"dl_parquet_{nome}")
     else:
         st.info("Configure o período e os índices desejados, depois clique em **Buscar índices**.")
 
@@ -1,12 +1,39 @@
 from __future__ import annotations
 
+import json
+import shutil
+import threading
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import date
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Union, List, Dict, Any, Tuple
+from typing import Optional, Union, List, Dict, Any, Tuple, Callable, BinaryIO
+
+
+def criar_sessao_http() -> requests.Session:
+    """
+    Cria uma sessão HTTP com keep-alive, pool de conexões e retry com backoff.
+
+    Reaproveitar a mesma sessão evita um handshake TCP+TLS por requisição.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    session.headers.update({"User-Agent": "scr-pipeline/1.0"})
+    return session
+
+
+_SESSION = criar_sessao_http()
 
 
 # ============================================================
@@ -39,6 +66,15 @@ AUX_COLS: List[str] = [
     "taxa_ativo_problematico",
 ]
 
+# Cubo pré-agregado (dimensões de baixa cardinalidade x medidas somáveis)
+CUBO_DIMENSOES: List[str] = ["data_base", "uf", "modalidade", "cliente"]
+CUBO_MEDIDAS: List[str] = [
+    "carteira_ativa",
+    "carteira_inadimplencia",
+    "carteira_vencida",
+    "ativo_problematico",
+]
+
 # Aliases por versão -> padrão único
 # (Ajuste conforme observar nomes reais nos arquivos V1/V2)
 SCHEMA_MAP: Dict[str, Dict[str, str]] = {
@@ -70,7 +106,7 @@ SCHEMA_MAP: Dict[str, Dict[str, str]] = {
 }
 
 
-def normalizar_schema_scr(df: pd.DataFrame, versao: str) -> Tuple[pd.DataFrame, List[str]]:
+def normalizar_schema_scr(df: pd.DataFrame, versao: str, copiar: bool = True) -> Tuple[pd.DataFrame, List[str]]:
     """
     Normaliza schema V1/V2 para um padrão único.
 
@@ -80,10 +116,13 @@ def normalizar_schema_scr(df: pd.DataFrame, versao: str) -> Tuple[pd.DataFrame,
       - Garantir que o dataset final tenha sempre as mesmas colunas (CORE_SCHEMA_COLS + AUX_COLS)
       - Incluir flag de versão (versao_scr) para compatibilidade temporal
 
+    Com copiar=False o DataFrame recebido é alterado no lugar (evita uma
+    cópia completa quando o chamador já é dono do objeto).
+
     Retorna:
       (df_normalizado, alertas)
     """
-    d = df.copy()
+    d = df.copy() if copiar else df
     alertas: List[str] = []
 
     v = (versao or "").lower().strip()
@@ -95,7 +134,7 @@ def normalizar_schema_scr(df: pd.DataFrame, versao: str) -> Tuple[pd.DataFrame,
     if v in SCHEMA_MAP:
         rename_map = {c: SCHEMA_MAP[v][c] for c in d.columns if c in SCHEMA_MAP[v]}
         if rename_map:
-            d = d.rename(columns=rename_map)
+            d.rename(columns=rename_map, inplace=True)
 
     # 2) Flag de versão
     d["versao_scr"] = v
@@ -140,7 +179,19 @@ def normalizar_schema_scr(df: pd.DataFrame, versao: str) -> Tuple[pd.DataFrame,
     return d, alertas
 
 
-def criar_indicadores_core(df: pd.DataFrame) -> pd.DataFrame:
+def _razao(num: pd.Series, den: pd.Series) -> np.ndarray:
+    """
+    num / den em uma única passada: onde den == 0 o resultado fica NaN
+    (nunca gera inf, dispensando o .replace([inf, -inf], nan)).
+    """
+    a = num.to_numpy(dtype="f8", na_value=np.nan)
+    b = den.to_numpy(dtype="f8", na_value=np.nan)
+    out = np.full(a.shape, np.nan, dtype="f8")
+    np.divide(a, b, out=out, where=b != 0)
+    return out
+
+
+def criar_indicadores_core(df: pd.DataFrame, copiar: bool = True) -> pd.DataFrame:
     """
     Redefine o conjunto de indicadores "core" (comparáveis entre V1 e V2),
     calculando taxas de forma padronizada quando possível.
@@ -150,20 +201,21 @@ def criar_indicadores_core(df: pd.DataFrame) -> pd.DataFrame:
       - Carteira Vencida (mantém/deriva na normalização)
       - Taxa de Inadimplência (calcula se possível)
       - Percentual de Carteira Problemática (calcula se possível)
+
+    Com copiar=False as colunas são criadas no próprio DataFrame recebido.
     """
-    d = df.copy()
+    d = df.copy() if copiar else df
 
     if {"carteira_inadimplencia", "carteira_ativa"}.issubset(d.columns):
-        d["taxa_inadimplencia"] = (d["carteira_inadimplencia"] / d["carteira_ativa"]).replace([np.inf, -np.inf], np.nan)
+        d["taxa_inadimplencia"] = _razao(d["carteira_inadimplencia"], d["carteira_ativa"])
 
     if {"carteira_vencida", "carteira_ativa"}.issubset(d.columns):
-        d["perc_carteira_vencida"] = (d["carteira_vencida"] / d["carteira_ativa"]).replace([np.inf, -np.inf], np.nan)
-
-    if {"ativo_problematico", "carteira_ativa"}.issubset(d.columns):
-        d["taxa_ativo_problematico"] = (d["ativo_problematico"] / d["carteira_ativa"]).replace([np.inf, -np.inf], np.nan)
+        d["perc_carteira_vencida"] = _razao(d["carteira_vencida"], d["carteira_ativa"])
 
     if {"ativo_problematico", "carteira_ativa"}.issubset(d.columns):
-        d["perc_carteira_problematica"] = (d["ativo_problematico"] / d["carteira_ativa"]).replace([np.inf, -np.inf], np.nan)
+        d["taxa_ativo_problematico"] = _razao(d["ativo_problematico"], d["carteira_ativa"])
+        # mesma razão: reaproveita o vetor em vez de dividir de novo
+        d["perc_carteira_problematica"] = d["taxa_ativo_problematico"].to_numpy(copy=True)
 
     return d
 
@@ -177,6 +229,39 @@ def validar_core_schema(df: pd.DataFrame) -> List[str]:
     return alertas
 
 
+# Tabela de tradução única para remover acentos dos nomes de colunas
+_TRANS_ACENTOS = str.maketrans({"ç": "c", "ã": "a", "á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u"})
+
+# Número já sem separador de milhar e com "." decimal (ex.: "1234.56", "-5", "1e3")
+_RE_NUMERO = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
+
+
+def _texto_para_numero(s: pd.Series) -> pd.Series:
+    """
+    Converte texto monetário no formato brasileiro ("1.234,56") para float64
+    com kernels do pyarrow.compute (uma passada vetorizada por etapa).
+    Valores não numéricos viram NaN, como em pd.to_numeric(errors="coerce").
+    """
+    try:
+        arr = pa.array(s, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # coluna object com tipos mistos: mantém o caminho via pandas
+        try:
+            return pd.to_numeric(
+                s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+                errors="coerce",
+            )
+        except AttributeError:
+            return s
+
+    arr = pc.replace_substring(arr, ".", "")
+    arr = pc.replace_substring(arr, ",", ".")
+    arr = pc.utf8_trim_whitespace(arr)
+    arr = pc.if_else(pc.match_substring_regex(arr, _RE_NUMERO), arr, pa.scalar(None, pa.string()))
+    valores = pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+    return pd.Series(valores, index=s.index, name=s.name)
+
+
 def processar_scrdata(
     df: pd.DataFrame,
     versao: str = "desconhecida",
@@ -205,25 +290,14 @@ def processar_scrdata(
     # ------------------------------------------------
     # 1. Padronizar nomes das colunas
     # ------------------------------------------------
-    df.columns = (
-        df.columns
-        .str.lower()
-        .str.strip()
-        .str.replace(" ", "_")
-        .str.replace("ç", "c")
-        .str.replace("ã", "a")
-        .str.replace("á", "a")
-        .str.replace("é", "e")
-        .str.replace("í", "i")
-        .str.replace("ó", "o")
-        .str.replace("ú", "u")
-    )
+    df.columns = [c.lower().strip().replace(" ", "_").translate(_TRANS_ACENTOS) for c in df.columns]
 
     # ------------------------------------------------
     # 2. Converter data
     # ------------------------------------------------
     if "data_base" in df.columns:
-        df["data_base"] = pd.to_datetime(df["data_base"], errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(df["data_base"]):
+            df["data_base"] = pd.to_datetime(df["data_base"], errors="coerce")
         df["ano"] = df["data_base"].dt.year
         df["mes"] = df["data_base"].dt.month
 
@@ -245,57 +319,56 @@ def processar_scrdata(
 
     for c in colunas_para_converter:
         if df[c].dtype == "object":
-            try:
-                df[c] = (
-                    df[c]
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                )
-                df[c] = pd.to_numeric(df[c], errors="coerce")
-            except Exception:
-                pass
+            df[c] = _texto_para_numero(df[c])
 
     # ------------------------------------------------
     # 4. Normalizar schema (V1/V2) + flag de versão
     # ------------------------------------------------
-    df, alertas_schema = normalizar_schema_scr(df, versao=versao)
+    df, alertas_schema = normalizar_schema_scr(df, versao=versao, copiar=False)
     df.attrs["alertas_schema"] = alertas_schema
 
     # ------------------------------------------------
     # 5. Criar indicadores core padronizados
     # ------------------------------------------------
     if criar_indicadores:
-        df = criar_indicadores_core(df)
+        df = criar_indicadores_core(df, copiar=False)
 
     # ------------------------------------------------
     # 6. Remover registros sem valor analítico
     # ------------------------------------------------
     if remover_zeros and "carteira_ativa" in df.columns:
-        antes = len(df)
-        df = df[df["carteira_ativa"] > 0]
-        depois = len(df)
+        manter = (df["carteira_ativa"] > 0).to_numpy()
+        removidas = int((~manter).sum())
+        if removidas:
+            df = df[manter]
 
         if verbose:
-            print(f"🧹 Removidas {antes - depois:,} linhas com carteira zerada.")
+            print(f"🧹 Removidas {removidas:,} linhas com carteira zerada.")
 
     # ------------------------------------------------
     # 7. Checagem de consistência
     # ------------------------------------------------
     if {"carteira_ativa", "carteira_vencida"}.issubset(df.columns):
-        inconsistentes = df[df["carteira_vencida"] > df["carteira_ativa"]]
-        if verbose and len(inconsistentes) > 0:
-            print(f"⚠️ {len(inconsistentes)} registros inconsistentes encontrados (vencida > ativa).")
+        # só a contagem é usada: soma a máscara em vez de materializar o recorte
+        inconsistentes = int((df["carteira_vencida"] > df["carteira_ativa"]).sum())
+        if verbose and inconsistentes > 0:
+            print(f"⚠️ {inconsistentes} registros inconsistentes encontrados (vencida > ativa).")
 
     # ------------------------------------------------
-    # 8. Ordenar dataset
+    # 8. Ordenar dataset + reset index (numa única cópia)
     # ------------------------------------------------
     if "data_base" in df.columns:
-        df = df.sort_values("data_base")
+        df = df.sort_values("data_base", ignore_index=True)
+    else:
+        df = df.reset_index(drop=True)
 
     # ------------------------------------------------
-    # 9. Reset index
+    # 9. Colunas de texto de baixa cardinalidade -> category
+    # (filtros e groupby passam a operar sobre códigos inteiros)
     # ------------------------------------------------
-    df = df.reset_index(drop=True)
+    for c in colunas_texto + ["__arquivo_origem"]:
+        if c in df.columns and df[c].dtype == "object":
+            df[c] = df[c].astype("category")
 
     # ------------------------------------------------
     # 10. Validação final + alertas de compatibilidade
@@ -318,6 +391,318 @@ def processar_scrdata(
     return df
 
 
+def construir_cubo_scr(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pré-agrega o SCR processado em (data_base, uf, modalidade, cliente),
+    somando as medidas e contando registros. A taxa de inadimplência do cubo
+    é sum(inadimplência) / sum(carteira ativa), equivalente à média ponderada
+    pela carteira ativa sobre as linhas originais.
+    """
+    dims = [c for c in CUBO_DIMENSOES if c in df.columns]
+    medidas = [c for c in CUBO_MEDIDAS if c in df.columns]
+
+    grupos = df.groupby(dims, observed=True, dropna=False)
+    cubo = grupos[medidas].sum(min_count=1)
+    cubo["qtd_registros"] = grupos.size()
+    cubo = cubo.reset_index()
+
+    if {"carteira_inadimplencia", "carteira_ativa"}.issubset(cubo.columns):
+        cubo["taxa_inadimplencia"] = cubo["carteira_inadimplencia"] / cubo["carteira_ativa"].replace(0, np.nan)
+
+    return cubo
+
+
+def remover_dir_em_segundo_plano(path: Path) -> None:
+    """
+    Remove um diretório sem bloquear o pipeline: renomeia para um irmão
+    temporário (um único rename) e apaga o conteúdo numa thread daemon.
+    Sobras de execuções anteriores (`<nome>.old-*`) entram na mesma limpeza.
+    """
+    path = Path(path)
+    alvos = sorted(path.parent.glob(f"{path.name}.old-*"))
+    if path.exists():
+        tmp = path.with_name(f"{path.name}.old-{uuid.uuid4().hex[:8]}")
+        path.rename(tmp)
+        alvos.append(tmp)
+
+    def apagar() -> None:
+        for alvo in alvos:
+            shutil.rmtree(alvo, ignore_errors=True)
+
+    if alvos:
+        threading.Thread(target=apagar, daemon=True).start()
+
+
+# ============================================================
+# Leitura de CSVs via Arrow
+# ============================================================
+
+def ler_csv_arrow(
+    fonte: Union[Path, Callable[[], BinaryIO]],
+    sep: str,
+    encoding: str = "utf-8",
+    nome_origem: Optional[str] = None,
+) -> pa.Table:
+    """
+    Lê um CSV com o parser multithread do pyarrow (fallback para latin1).
+
+    `fonte` é um caminho em disco ou uma função que abre o arquivo em modo
+    binário (ex.: membro de um ZIP), chamada de novo no fallback de encoding.
+    Se `nome_origem` for informado, adiciona a coluna `__arquivo_origem`
+    já como dictionary (um único valor por arquivo, sem cópia de strings).
+    """
+    parse_options = pv.ParseOptions(delimiter=sep)
+    # como no pd.read_csv: campo vazio (e "NA", "NULL"...) em coluna texto vira nulo, não ""
+    convert_options = pv.ConvertOptions(strings_can_be_null=True)
+
+    def ler(enc: str) -> pa.Table:
+        read_options = pv.ReadOptions(encoding=enc)
+        if callable(fonte):
+            with fonte() as f:
+                return pv.read_csv(f, read_options=read_options, parse_options=parse_options,
+                                   convert_options=convert_options)
+        return pv.read_csv(str(fonte), read_options=read_options, parse_options=parse_options,
+                           convert_options=convert_options)
+
+    try:
+        table = ler(encoding)
+        # bytes inválidos no encoding pedido fazem o pyarrow inferir a coluna como binary
+        if any(pa.types.is_binary(f.type) for f in table.schema):
+            table = ler("latin1")
+    except (pa.ArrowInvalid, UnicodeDecodeError):
+        table = ler("latin1")
+
+    if nome_origem is not None:
+        origem = pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(table.num_rows, dtype=np.int32)),
+            pa.array([nome_origem]),
+        )
+        table = table.append_column("__arquivo_origem", origem)
+
+    return table
+
+
+def inferir_sep(amostra: bytes) -> str:
+    # ";" e "," são ASCII: conta direto nos bytes, sem decodificar a amostra
+    return ";" if amostra.count(b";") > amostra.count(b",") else ","
+
+
+def _ler_amostra(csv_path: Path, tamanho: int = 50_000) -> bytes:
+    with open(csv_path, "rb") as f:
+        return f.read(tamanho)
+
+
+def ler_csvs_disco(
+    csv_paths: List[Path],
+    sep: Optional[str] = None,
+    encoding: str = "utf-8",
+    adicionar_coluna_origem: bool = True,
+) -> List[pa.Table]:
+    """Lê CSVs já extraídos em disco, em paralelo (pyarrow libera o GIL no parse)."""
+    if not csv_paths:
+        return []
+
+    def ler(p: Path) -> pa.Table:
+        return ler_csv_arrow(
+            p,
+            sep=sep or inferir_sep(_ler_amostra(p)),
+            encoding=encoding,
+            nome_origem=p.name if adicionar_coluna_origem else None,
+        )
+
+    with ThreadPoolExecutor(max_workers=min(8, len(csv_paths))) as ex:
+        return list(ex.map(ler, csv_paths))
+
+
+def ler_csvs_zip(
+    zip_path: Path,
+    sep: Optional[str] = None,
+    encoding: str = "utf-8",
+    adicionar_coluna_origem: bool = True,
+) -> List[pa.Table]:
+    """
+    Lê os CSVs direto de dentro do ZIP, sem extraí-los para disco
+    (cada membro é descomprimido em streaming para o parser do pyarrow).
+    """
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        nomes = sorted(n for n in zf.namelist() if n.lower().endswith(".csv"))
+        if not nomes:
+            return []
+
+        def ler(nome: str) -> pa.Table:
+            with zf.open(nome) as f:
+                amostra = f.read(50_000)
+            return ler_csv_arrow(
+                lambda: zf.open(nome),
+                sep=sep or inferir_sep(amostra),
+                encoding=encoding,
+                nome_origem=Path(nome).name if adicionar_coluna_origem else None,
+            )
+
+        with ThreadPoolExecutor(max_workers=min(8, len(nomes))) as ex:
+            return list(ex.map(ler, nomes))
+
+
+def concatenar_tabelas_arrow(tables: List[pa.Table]) -> pa.Table:
+    """
+    Concatena tabelas Arrow promovendo schemas (colunas ausentes viram nulas,
+    int -> float etc.). Colunas com tipos incompatíveis entre arquivos
+    (ex.: int64 num mês, string em outro) são lidas como string.
+    """
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    tipos: Dict[str, set] = {}
+    for t in tables:
+        for field in t.schema:
+            if not pa.types.is_null(field.type):
+                tipos.setdefault(field.name, set()).add(field.type)
+    conflitantes = {nome for nome, ts in tipos.items() if len(ts) > 1}
+
+    tables = [
+        t.cast(pa.schema([f.with_type(pa.string()) if f.name in conflitantes else f for f in t.schema]))
+        for t in tables
+    ]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+# ============================================================
+# Parquet particionado por UF (hive: uf=SP/, uf=RJ/, ...)
+# ============================================================
+
+# Parâmetros do processamento gravados junto do dataset (prefixo "_" faz o
+# pyarrow.dataset ignorar o arquivo na leitura)
+ARQUIVO_PARAMETROS = "_parametros.json"
+# Posição original de cada linha: as partições embaralham a ordem na leitura
+COLUNA_ORDEM = "__ordem"
+
+
+def salvar_scr_particionado(
+    df: pd.DataFrame,
+    destino: Path,
+    parametros: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Salva o SCR processado como dataset parquet particionado por `uf`,
+    para que leituras filtradas por UF só abram os arquivos da partição.
+
+    Escreve num diretório irmão temporário e só no fim troca pelo destino
+    (rename): o dataset anterior é substituído por inteiro (sem partições
+    antigas sobrando) e uma escrita interrompida nunca deixa um `destino`
+    parcial para o fast path do pipeline.
+
+    Grava também `_parametros.json` com `parametros` e a ordem original das
+    colunas (a partição move `uf` para o fim na leitura), e a coluna
+    `__ordem` com a posição de cada linha para restaurar a ordem das linhas.
+    """
+    destino = Path(destino)
+    tmp = destino.with_name(f"{destino.name}.tmp-{uuid.uuid4().hex[:8]}")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column(COLUNA_ORDEM, pa.array(np.arange(len(df), dtype=np.int64)))
+    particionamento = ds.partitioning(pa.schema([table.schema.field("uf")]), flavor="hive")
+    try:
+        ds.write_dataset(
+            table,
+            str(tmp),
+            format="parquet",
+            partitioning=particionamento,
+            basename_template="part-{i}.parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd", use_dictionary=True),
+            max_rows_per_group=500_000,
+        )
+        meta = {"parametros": parametros or {}, "colunas": list(df.columns)}
+        (tmp / ARQUIVO_PARAMETROS).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if destino.is_file():
+        destino.unlink()  # parquet de arquivo único (formato antigo)
+    remover_dir_em_segundo_plano(destino)
+    tmp.rename(destino)
+
+
+def ler_scr_particionado(
+    origem: Union[str, Path],
+    colunas: Optional[List[str]] = None,
+    filtros: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """
+    Lê o SCR processado aplicando os filtros de igualdade (ex.: {"uf": "SP"})
+    no próprio dataset: partições de outras UFs nem são abertas e os demais
+    filtros usam as estatísticas dos row groups.
+    """
+    dataset = ds.dataset(str(origem), format="parquet", partitioning="hive")
+    tem_ordem = COLUNA_ORDEM in dataset.schema.names
+    leitura = colunas + [COLUNA_ORDEM] if (colunas is not None and tem_ordem) else colunas
+
+    expr = None
+    for col, valor in (filtros or {}).items():
+        cond = ds.field(col) == valor
+        expr = cond if expr is None else expr & cond
+
+    df = dataset.to_table(columns=leitura, filter=expr).to_pandas()
+    if "uf" in df.columns and df["uf"].dtype == "object":
+        df["uf"] = df["uf"].astype("category")
+
+    # partições voltam em ordem de diretório e com `uf` no fim: restaura a
+    # ordem original das linhas (__ordem) e das colunas (_parametros.json)
+    if tem_ordem:
+        df = df.take(np.argsort(df[COLUNA_ORDEM].to_numpy(), kind="stable"))
+        df = df.drop(columns=COLUNA_ORDEM).reset_index(drop=True)
+    elif "data_base" in df.columns:
+        df = df.sort_values("data_base", kind="stable", ignore_index=True)
+    if colunas is None:
+        ordem = ler_parametros_scr(origem).get("colunas") or []
+        ordem = [c for c in ordem if c in df.columns]
+        if ordem:
+            df = df[ordem + [c for c in df.columns if c not in ordem]]
+    return df
+
+
+def ler_parametros_scr(origem: Union[str, Path]) -> Dict[str, Any]:
+    """Lê o `_parametros.json` do dataset ({} se não existir ou for inválido)."""
+    arq = Path(origem) / ARQUIVO_PARAMETROS
+    try:
+        return json.loads(arq.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _filtrar_df(df: pd.DataFrame, filtros: Optional[Dict[str, Any]]) -> pd.DataFrame:
+    """Filtros de igualdade em memória (mesma semântica do filtro no dataset: nulo nunca casa)."""
+    if not filtros:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    for col, valor in filtros.items():
+        mask &= (df[col] == valor).to_numpy(dtype=bool, na_value=False)
+    return df[mask].reset_index(drop=True)
+
+
+def _filtrar_cubo(df_cube: Optional[pd.DataFrame], filtros: Optional[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+    """
+    Aplica ao cubo os mesmos filtros do dataset. Filtro em coluna que não é
+    dimensão do cubo não tem como ser respeitado: retorna None nesse caso.
+    """
+    if df_cube is None or not filtros:
+        return df_cube
+    if any(col not in CUBO_DIMENSOES for col in filtros):
+        return None
+    return _filtrar_df(df_cube, {c: v for c, v in filtros.items() if c in df_cube.columns})
+
+
+def _ler_cubo(cube_path: Path, filtros: Optional[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+    """Lê o cubo salvo em disco já com os filtros (ver _filtrar_cubo)."""
+    if not cube_path.exists():
+        return None
+    if filtros and any(col not in CUBO_DIMENSOES for col in filtros):
+        return None
+    return _filtrar_cubo(pd.read_parquet(cube_path), filtros)
+
+
 def pipeline_scrdata(
     ano: int,
     base_dir: Union[str, Path] = "data/scrdata",
@@ -330,21 +715,38 @@ def pipeline_scrdata(
     remover_zeros: bool = True,
     criar_indicadores: bool = True,
     versao_scr: str = "desconhecida",
+    extrair_csvs: bool = False,
+    colunas: Optional[List[str]] = None,
+    filtros: Optional[Dict[str, Any]] = None,
     verbose: bool = True,
 ) -> Dict[str, Any]:
     """
     Pipeline completo do SCR.data:
+    - reaproveita o parquet processado do ano, se existir (cache)
     - baixa ZIP por ano (com cache)
-    - extrai (com cache)
+    - lê os CSVs mensais direto do ZIP (ou extrai em disco, se extrair_csvs=True)
     - concatena todos os CSVs mensais
     - processa (tipos, datas, normalização de schema, indicadores core)
-    - salva em parquet/csv
+    - salva em parquet (particionado por uf) e/ou csv
     - retorna artefatos e DataFrame
 
     Retorna um dicionário com:
-      - df_raw, df_processed
-      - paths (zip, extracted_dir, parquet/csv)
+      - df_raw (None quando o parquet em cache é usado), df_processed
+      - df_cube (pré-agregado por data_base/uf/modalidade/cliente)
+      - paths (zip, extracted_dir, parquet/cube/csv)
       - metadata
+
+    `filtros` (ex.: {"uf": "SP"}) restringe df_processed e df_cube do mesmo
+    jeito com ou sem cache: no parquet em cache vira filtro por partição; no
+    processamento completo é aplicado em memória depois de salvar o ano inteiro.
+    O cubo fica None se algum filtro não for dimensão do cubo.
+    `colunas` projeta df_processed nas duas situações (no parquet em cache,
+    só essas colunas são lidas). Com cache, linhas e colunas voltam na mesma
+    ordem do processamento completo.
+
+    O parquet em cache só é reaproveitado se foi gerado com os mesmos
+    `versao_scr`, `remover_zeros` e `criar_indicadores`; caso contrário o
+    ano é reprocessado.
     """
     if not (1900 <= int(ano) <= 2100):
         raise ValueError(f"Ano inválido: {ano}")
@@ -356,11 +758,59 @@ def pipeline_scrdata(
     processed_dir = ano_dir / "processed"
 
     raw_dir.mkdir(parents=True, exist_ok=True)
-    extracted_dir.mkdir(parents=True, exist_ok=True)
     processed_dir.mkdir(parents=True, exist_ok=True)
 
     url = f"https://www.bcb.gov.br/pda/desig/scrdata_{ano}.zip"
     zip_path = raw_dir / f"scrdata_{ano}.zip"
+    parquet_path = processed_dir / f"scrdata_{ano}.parquet"
+    cube_path = processed_dir / f"scrdata_{ano}_cube.parquet"
+    csv_path = processed_dir / f"scrdata_{ano}.csv"
+
+    parametros = {
+        "versao_scr": versao_scr,
+        "remover_zeros": remover_zeros,
+        "criar_indicadores": criar_indicadores,
+    }
+
+    # ---------------------------
+    # 0) Parquet processado já existe (com os mesmos parâmetros):
+    #    pula download/extração/processamento
+    # ---------------------------
+    cache_valido = (
+        parquet_path.is_dir()
+        and ler_parametros_scr(parquet_path).get("parametros") == parametros
+    )
+    if parquet_path.exists() and not cache_valido and not forcar_download and verbose:
+        print(f"ℹ️ Parquet {ano} gerado com outros parâmetros: será reprocessado.")
+
+    if cache_valido and not forcar_download:
+        if verbose:
+            print(f"ℹ️ Parquet {ano} já existe: {parquet_path.resolve()}")
+            print("➡️ Download, extração e processamento não serão realizados.")
+        df_processed = ler_scr_particionado(parquet_path, colunas=colunas, filtros=filtros)
+        df_processed.attrs["fonte_url"] = url
+        df_processed.attrs["parquet_path"] = str(parquet_path.resolve())
+        return {
+            "df_raw": None,
+            "df_processed": df_processed,
+            "df_cube": _ler_cubo(cube_path, filtros),
+            "paths": {
+                "zip": zip_path.resolve(),
+                "extracted_dir": extracted_dir.resolve() if extracted_dir.exists() else None,
+                "parquet": parquet_path.resolve(),
+                "cube": cube_path.resolve() if cube_path.exists() else None,
+                "csv": csv_path.resolve() if csv_path.exists() else None,
+            },
+            "metadata": {
+                "ano": ano,
+                "url": url,
+                "versao_scr": versao_scr,
+                "csv_count": None,
+                "rows_raw": None,
+                "rows_processed": len(df_processed),
+                "cols_processed": len(df_processed.columns),
+            }
+        }
 
     # ---------------------------
     # 1) Download (cache por ano)
@@ -372,78 +822,69 @@ def pipeline_scrdata(
     else:
         if verbose:
             print(f"⬇️ Baixando: {url}")
-        r = requests.get(url, timeout=180)
+        r = _SESSION.get(url, timeout=180)
         r.raise_for_status()
         zip_path.write_bytes(r.content)
         if verbose:
             print(f"✅ ZIP salvo em: {zip_path.resolve()}")
 
     # ---------------------------
-    # 2) Extração (cache)
+    # 2) Extração (opcional, com cache)
     # ---------------------------
-    ja_extraido = any(extracted_dir.rglob("*.csv"))
-    if ja_extraido and not forcar_download:
-        if verbose:
-            print(f"ℹ️ CSVs já extraídos em: {extracted_dir.resolve()}")
-            print("➡️ Extração não será realizada.")
-    else:
-        if forcar_download:
-            # limpa extração para evitar mistura
-            for p in sorted(extracted_dir.rglob("*"), reverse=True):
-                if p.is_file():
-                    p.unlink()
-                elif p.is_dir():
-                    try:
-                        p.rmdir()
-                    except OSError:
-                        pass
-
-        if verbose:
-            print(f"🗜️ Extraindo para: {extracted_dir.resolve()}")
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(extracted_dir)
-        if verbose:
-            print("✅ Extração concluída.")
+    if extrair_csvs:
+        extracted_dir.mkdir(parents=True, exist_ok=True)
+        ja_extraido = any(extracted_dir.rglob("*.csv"))
+        if ja_extraido and not forcar_download:
+            if verbose:
+                print(f"ℹ️ CSVs já extraídos em: {extracted_dir.resolve()}")
+                print("➡️ Extração não será realizada.")
+        else:
+            if forcar_download:
+                # limpa extração para evitar mistura
+                remover_dir_em_segundo_plano(extracted_dir)
+                extracted_dir.mkdir(parents=True, exist_ok=True)
+
+            if verbose:
+                print(f"🗜️ Extraindo para: {extracted_dir.resolve()}")
+            with zipfile.ZipFile(zip_path, "r") as zf:
+                zf.extractall(extracted_dir)
+            if verbose:
+                print("✅ Extração concluída.")
 
     # ---------------------------
-    # 3) Localizar CSVs
+    # 3) Ler CSVs (direto do ZIP ou do diretório extraído)
     # ---------------------------
-    csv_paths = sorted(extracted_dir.rglob("*.csv"))
-    if not csv_paths:
-        raise FileNotFoundError(f"Nenhum CSV encontrado em {extracted_dir.resolve()}")
+    if extrair_csvs:
+        origem_csvs = extracted_dir
+        tables = ler_csvs_disco(sorted(extracted_dir.rglob("*.csv")), sep=sep, encoding=encoding,
+                                adicionar_coluna_origem=adicionar_coluna_origem)
+    else:
+        origem_csvs = zip_path
+        tables = ler_csvs_zip(zip_path, sep=sep, encoding=encoding,
+                              adicionar_coluna_origem=adicionar_coluna_origem)
 
+    if not tables:
+        raise FileNotFoundError(f"Nenhum CSV encontrado em {origem_csvs.resolve()}")
+
+    csv_count = len(tables)
     if verbose:
-        print(f"📄 CSVs encontrados: {len(csv_paths)}")
+        print(f"📄 CSVs lidos: {csv_count}")
 
     # ---------------------------
-    # 4) Ler e concatenar CSVs
+    # 4) Concatenar CSVs
     # ---------------------------
-    def inferir_sep(csv_path: Path, enc: str) -> str:
-        sample = csv_path.read_bytes()[:50_000]
-        text = sample.decode(enc, errors="ignore")
-        return ";" if text.count(";") > text.count(",") else ","
-
-    dfs: List[pd.DataFrame] = []
-    for p in csv_paths:
-        local_sep = sep or inferir_sep(p, encoding)
-
-        try:
-            df_part = pd.read_csv(p, encoding=encoding, sep=local_sep)
-        except UnicodeDecodeError:
-            df_part = pd.read_csv(p, encoding="latin1", sep=local_sep)
-
-        if adicionar_coluna_origem:
-            df_part["__arquivo_origem"] = p.name
-
-        dfs.append(df_part)
-
-    df_raw = pd.concat(dfs, ignore_index=True, sort=False)
+    # uma única conversão Arrow -> pandas; self_destruct libera os buffers Arrow
+    # coluna a coluna durante a conversão (evita pico de memória 2x)
+    big = concatenar_tabelas_arrow(tables)
+    del tables
+    df_raw = big.to_pandas(self_destruct=True, split_blocks=True)
+    del big
 
     if verbose:
         print(f"✅ RAW consolidado: {len(df_raw):,} linhas | {len(df_raw.columns)} colunas")
 
     # ---------------------------
-    # 5) Processar (normalização + indicadores core)
+    # 5) Processar (normalização + indicadores core) + cubo pré-agregado
     # ---------------------------
     df_processed = processar_scrdata(
         df_raw,
@@ -453,44 +894,56 @@ def pipeline_scrdata(
         verbose=verbose
     )
 
+    df_cube = construir_cubo_scr(df_processed)
+
     # ---------------------------
     # 6) Salvar outputs
     # ---------------------------
-    parquet_path = processed_dir / f"scrdata_{ano}.parquet"
-    csv_path = processed_dir / f"scrdata_{ano}.csv"
-
     if salvar_parquet:
-        df_processed.to_parquet(parquet_path, index=False)
+        salvar_scr_particionado(df_processed, parquet_path, parametros=parametros)
+        df_cube.to_parquet(cube_path, index=False, compression="zstd")
         if verbose:
             print(f"💾 Parquet salvo em: {parquet_path.resolve()}")
+            print(f"💾 Cubo salvo em: {cube_path.resolve()} ({len(df_cube):,} linhas)")
 
     if salvar_csv:
         df_processed.to_csv(csv_path, index=False, encoding="utf-8-sig")
         if verbose:
             print(f"💾 CSV salvo em: {csv_path.resolve()}")
 
+    # ---------------------------
+    # 7) Mesmos filtros/colunas do caminho em cache (o ano inteiro já foi salvo acima)
+    # ---------------------------
+    if filtros:
+        df_processed = _filtrar_df(df_processed, filtros)
+        df_cube = _filtrar_cubo(df_cube, filtros)
+    if colunas is not None:
+        df_processed = df_processed[colunas]
+
     # Metadados
     df_processed.attrs["fonte_url"] = url
     df_processed.attrs["zip_path"] = str(zip_path.resolve())
-    df_processed.attrs["extracted_dir"] = str(extracted_dir.resolve())
+    df_processed.attrs["extracted_dir"] = str(extracted_dir.resolve()) if extrair_csvs else None
     df_processed.attrs["parquet_path"] = str(parquet_path.resolve()) if salvar_parquet else None
     df_processed.attrs["csv_path"] = str(csv_path.resolve()) if salvar_csv else None
-    df_processed.attrs["csv_count"] = len(csv_paths)
+    df_processed.attrs["csv_count"] = csv_count
 
     return {
         "df_raw": df_raw,
         "df_processed": df_processed,
+        "df_cube": df_cube,
         "paths": {
             "zip": zip_path.resolve(),
-            "extracted_dir": extracted_dir.resolve(),
+            "extracted_dir": extracted_dir.resolve() if extrair_csvs else None,
             "parquet": parquet_path.resolve() if salvar_parquet else None,
+            "cube": cube_path.resolve() if salvar_parquet else None,
             "csv": csv_path.resolve() if salvar_csv else None,
         },
         "metadata": {
             "ano": ano,
             "url": url,
             "versao_scr": versao_scr,
-            "csv_count": len(csv_paths),
+            "csv_count": csv_count,
             "rows_raw": len(df_raw),
             "rows_processed": len(df_processed),
             "cols_processed": len(df_processed.columns),
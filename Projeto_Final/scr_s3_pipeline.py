@@ -6,8 +6,8 @@ Para cada ano:
 - sobe ZIP no S3 (raw)
 - extrai CSVs do ZIP
 - concatena e processa (reusa processar_scrdata do seu scr_pipeline.py)
-- salva Parquet (compressão)
-- sobe Parquet no S3 (processed)
+- serializa Parquet em memória (compressão)
+- sobe Parquet no S3 (processed, multipart)
 
 Uso:
   python scr_s3_pipeline.py --bucket SEU_BUCKET --prefix scr --start-year 2012 --end-year 2025
@@ -21,23 +21,43 @@ Credenciais AWS:
 from __future__ import annotations
 
 import argparse
+import io
+import json
 import os
-import shutil
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Optional, List
 
 import boto3
 import pandas as pd
-import requests
+from boto3.s3.transfer import TransferConfig
 
 # Reaproveita seu processamento (tipos + indicadores etc.)
 # Certifique-se de que scr_pipeline.py está no mesmo diretório do script
-from scr_pipeline import processar_scrdata
+from scr_pipeline import (
+    processar_scrdata,
+    criar_sessao_http,
+    ler_csvs_disco,
+    concatenar_tabelas_arrow,
+    remover_dir_em_segundo_plano,
+)
 
 
 BCB_URL_TEMPLATE = "https://www.bcb.gov.br/pda/desig/scrdata_{ano}.zip"
 
+# Sessão HTTP reaproveitada entre anos (keep-alive + pool de conexões)
+_SESSION = criar_sessao_http()
+
+# Upload multipart: partes de 16 MB enviadas em paralelo
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
 
 # ----------------------------
 # Utilitários
@@ -46,16 +66,59 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
-def download_zip_streaming(url: str, out_path: Path, timeout: int = 300, chunk_size: int = 1024 * 1024) -> None:
-    """Baixa arquivo grande sem carregar tudo em memória."""
+def download_zip_streaming(url: str, out_path: Path, timeout: int = 300, chunk_size: int = 1024 * 1024) -> bool:
+    """
+    Baixa arquivo grande sem carregar tudo em memória.
+
+    Guarda ETag/Last-Modified/tamanho num sidecar `.meta.json` e faz GET
+    condicional (If-None-Match / If-Modified-Since): se o BCB não republicou
+    o ZIP, a resposta é 304 sem corpo e o arquivo local é mantido.
+    Retorna True se o arquivo foi (re)baixado.
+    """
     ensure_dir(out_path.parent)
+    meta_path = out_path.with_name(out_path.name + ".meta.json")
 
-    with requests.get(url, stream=True, timeout=timeout) as r:
+    meta = {}
+    if out_path.exists() and meta_path.exists():
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except ValueError:
+            meta = {}
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with _SESSION.get(url, stream=True, timeout=timeout, headers=headers) as r:
+        if r.status_code == 304:
+            return False
         r.raise_for_status()
-        with open(out_path, "wb") as f:
+
+        # servidor ignorou os headers condicionais, mas o ETag bate: não baixa o corpo
+        etag = r.headers.get("ETag")
+        if (meta and etag and etag == meta.get("etag")
+                and out_path.stat().st_size == meta.get("size")):
+            return False
+
+        # grava em arquivo temporário: download interrompido não deixa ZIP
+        # truncado associado a um ETag válido
+        tmp_path = out_path.with_name(out_path.name + ".part")
+        with open(tmp_path, "wb") as f:
             for chunk in r.iter_content(chunk_size=chunk_size):
                 if chunk:
                     f.write(chunk)
+        tmp_path.replace(out_path)
+
+        meta = {
+            "etag": etag,
+            "last_modified": r.headers.get("Last-Modified"),
+            "size": out_path.stat().st_size,
+        }
+
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    return True
 
 
 def safe_extract_zip(zip_path: Path, extract_to: Path) -> None:
@@ -74,32 +137,28 @@ def safe_extract_zip(zip_path: Path, extract_to: Path) -> None:
         zf.extractall(extract_to)
 
 
-def infer_sep(csv_path: Path, encoding: str = "utf-8") -> str:
-    sample = csv_path.read_bytes()[:50_000]
-    text = sample.decode(encoding, errors="ignore")
-    return ";" if text.count(";") > text.count(",") else ","
-
-
 def read_and_concat_csvs(csv_paths: List[Path], encoding: str = "utf-8", sep: Optional[str] = None) -> pd.DataFrame:
-    dfs = []
-    for p in csv_paths:
-        local_sep = sep or infer_sep(p, encoding=encoding)
-        try:
-            df_part = pd.read_csv(p, encoding=encoding, sep=local_sep)
-        except UnicodeDecodeError:
-            df_part = pd.read_csv(p, encoding="latin1", sep=local_sep)
-
-        df_part["__arquivo_origem"] = p.name
-        dfs.append(df_part)
-
-    if not dfs:
+    if not csv_paths:
         return pd.DataFrame()
 
-    return pd.concat(dfs, ignore_index=True, sort=False)
+    tables = ler_csvs_disco(csv_paths, sep=sep, encoding=encoding)
+    big = concatenar_tabelas_arrow(tables)
+    del tables
+    return big.to_pandas(self_destruct=True, split_blocks=True)
 
 
 def s3_upload_file(s3_client, local_path: Path, bucket: str, key: str) -> None:
-    s3_client.upload_file(str(local_path), bucket, key)
+    s3_client.upload_file(str(local_path), bucket, key, Config=S3_TRANSFER_CONFIG)
+
+
+def s3_upload_parquet(s3_client, df: pd.DataFrame, bucket: str, key: str, compression: str = "zstd") -> int:
+    """Serializa o DataFrame em Parquet num buffer em memória e sobe direto (sem arquivo local)."""
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False, engine="pyarrow", compression=compression)
+    size = buf.tell()
+    buf.seek(0)
+    s3_client.upload_fileobj(buf, bucket, key, Config=S3_TRANSFER_CONFIG)
+    return size
 
 
 # ----------------------------
@@ -112,7 +171,7 @@ def process_year_to_s3(
     workdir: Path = Path("data_work"),
     remover_zeros: bool = True,
     criar_indicadores: bool = True,
-    parquet_compression: str = "snappy",
+    parquet_compression: str = "zstd",
     overwrite: bool = False,
 ) -> None:
     """
@@ -126,13 +185,10 @@ def process_year_to_s3(
     ano_dir = workdir / f"ano={ano}"
     raw_dir = ano_dir / "raw"
     extracted_dir = ano_dir / "extracted"
-    processed_dir = ano_dir / "processed"
     ensure_dir(raw_dir)
     ensure_dir(extracted_dir)
-    ensure_dir(processed_dir)
 
     zip_local = raw_dir / f"scrdata_{ano}.zip"
-    parquet_local = processed_dir / f"scrdata_{ano}.parquet"
 
     # Keys no S3 (pastas lógicas via prefixo)
     zip_key = f"{prefix}/raw/ano={ano}/scrdata_{ano}.zip"
@@ -150,8 +206,9 @@ def process_year_to_s3(
     print(f"\n=== Ano {ano} ===")
     print(f"⬇️ Download ZIP: {url}")
 
-    # 1) Download ZIP (streaming)
-    download_zip_streaming(url, zip_local)
+    # 1) Download ZIP (streaming, condicional)
+    if not download_zip_streaming(url, zip_local):
+        print(f"ℹ️ ZIP inalterado no BCB, reaproveitando: {zip_local}")
 
     # 2) Upload raw ZIP para S3
     print(f"☁️ Upload raw ZIP -> s3://{bucket}/{zip_key}")
@@ -159,8 +216,7 @@ def process_year_to_s3(
 
     # 3) Extração segura
     # limpa extração para evitar mistura
-    if extracted_dir.exists():
-        shutil.rmtree(extracted_dir)
+    remover_dir_em_segundo_plano(extracted_dir)
     ensure_dir(extracted_dir)
 
     print(f"🗜️ Extraindo ZIP local -> {extracted_dir}")
@@ -185,13 +241,10 @@ def process_year_to_s3(
         verbose=True,
     )
 
-    # 7) Salva parquet (compressão)
-    print(f"💾 Salvando Parquet local -> {parquet_local}")
-    df_processed.to_parquet(parquet_local, index=False, compression=parquet_compression)
-
-    # 8) Upload parquet para S3 (processed)
+    # 7) Parquet em memória -> S3 (processed), upload multipart
     print(f"☁️ Upload Parquet -> s3://{bucket}/{parquet_key}")
-    s3_upload_file(s3, parquet_local, bucket, parquet_key)
+    size = s3_upload_parquet(s3, df_processed, bucket, parquet_key, compression=parquet_compression)
+    print(f"💾 Parquet enviado ({size / 1024 / 1024:,.1f} MB)")
 
     print(f"✅ Concluído ano {ano}")
 
@@ -207,6 +260,10 @@ def main():
     parser.add_argument("--end-year", type=int, default=2025)
     parser.add_argument("--workdir", default="data_work", help="Diretório local temporário")
     parser.add_argument("--overwrite", action="store_true", help="Sobrescrever parquet no S3 se existir")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Anos processados em paralelo (padrão: 2). Cada processo mantém um ano "
+                             "inteiro em memória (RAW + processado + parquet em buffer), então o "
+                             "consumo de RAM cresce proporcionalmente ao nº de workers.")
     args = parser.parse_args()
 
     workdir = Path(args.workdir)
@@ -215,14 +272,26 @@ def main():
     if args.start_year > args.end_year:
         raise ValueError("start-year não pode ser maior que end-year")
 
-    for ano in range(args.start_year, args.end_year + 1):
-        process_year_to_s3(
-            ano=ano,
-            bucket=args.bucket,
-            prefix=args.prefix,
-            workdir=workdir,
-            overwrite=args.overwrite,
-        )
+    anos = list(range(args.start_year, args.end_year + 1))
+    workers = max(1, min(args.workers, len(anos)))
+
+    # Anos são independentes (workdir/ano=AAAA): processos sobrepõem download,
+    # parse (CPU-bound, por isso não threads) e upload entre anos.
+    processar_ano = partial(
+        process_year_to_s3,
+        bucket=args.bucket,
+        prefix=args.prefix,
+        workdir=workdir,
+        overwrite=args.overwrite,
+    )
+
+    if workers <= 1:
+        for ano in anos:
+            processar_ano(ano)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(processar_ano, anos))
 
 
 if __name__ == "__main__":
@@ -1,87 +1,350 @@
+import asyncio
+import functools
+import logging
 import os
-import boto3
-from botocore.exceptions import NoCredentialsError, ClientError
-from botocore.config import Config
-from botocore.exceptions import EndpointConnectionError, ConnectionClosedError, ReadTimeoutError, SSLError
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence
+
+# boto3/botocore são importados sob demanda (centenas de módulos, ~200-400 ms):
+# quem só usa show_env() não paga esse custo.
+if TYPE_CHECKING:
+    from botocore.config import Config
+
+log = logging.getLogger(__name__)
+
+KEYS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION", "AWS_REGION",
+        "HTTPS_PROXY", "HTTP_PROXY", "NO_PROXY")
 
 def show_env():
-    print("=== Variáveis de ambiente (parcial) ===")
-    for k in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION", "AWS_REGION",
-              "HTTPS_PROXY", "HTTP_PROXY", "NO_PROXY"]:
-        v = os.getenv(k)
+    log.info("=== Variáveis de ambiente (parcial) ===")
+    env = os.environ  # uma referência só, em vez de os.getenv por chave
+    for k in KEYS:
+        v = env.get(k)
         if v:
             if "SECRET" in k:
                 v = v[:4] + "..."  # mascara
-            print(f"{k}={v}")
+            log.info("%s=%s", k, v)
         else:
-            print(f"{k}=<não definido>")
-    print()
+            log.info("%s=<não definido>", k)
 
-def test_s3(bucket_name: str, prefix: str = "scr/"):
-    show_env()
+def _usar_parser_lxml() -> bool:
+    """
+    Troca o parser XML das respostas do botocore (xml.etree) pelo lxml (C),
+    3-5x mais rápido no parse das páginas de ListObjectsV2 em buckets grandes.
+    ATENÇÃO: altera `botocore.parsers` para o processo inteiro (todos os
+    clients, inclusive de outros módulos). Só é chamada no import, quando
+    S3_LXML_PARSER=1 (ver abaixo).
+    Element('') continua vindo do xml.etree (lxml não aceita tag vazia, usada
+    pelo botocore para corpo vazio). Sem lxml instalado, segue com o padrão.
+    """
+    try:
+        from lxml import etree as lxml_etree
+    except ImportError:
+        return False
+
+    import types
+    import xml.etree.ElementTree as std_etree
+
+    import botocore.parsers
+
+    def xml_parser(target=None, encoding=None):
+        # o TreeBuilder do lxml rejeita o namespace default do S3 (xmlns="...");
+        # o parser nativo (sem target) monta a árvore direto em C
+        # sem entidades externas nem rede (XXE): o expat da stdlib nunca resolvia,
+        # e o lxml < 5 resolve por padrão
+        return lxml_etree.XMLParser(encoding=encoding, remove_comments=True,
+                                    resolve_entities=False, no_network=True)
+
+    botocore.parsers.ETree = types.SimpleNamespace(
+        XMLParser=xml_parser,
+        TreeBuilder=lambda: None,
+        Element=std_etree.Element,
+    )
+    botocore.parsers.XMLParseError = (std_etree.ParseError, lxml_etree.XMLSyntaxError)
+    return True
+
+
+# Patch global do parser XML do botocore, opt-in: importa botocore.parsers
+# (~80 ms) já no import do módulo e vale para todo o processo.
+if os.getenv("S3_LXML_PARSER") == "1":
+    _usar_parser_lxml()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_session():
+    """
+    Session única: cadeia de credenciais e loaders resolvidos uma vez só.
+    Session não é thread-safe para criar clients em paralelo; clients já criados são.
+
+    Com credenciais no ambiente, elas são passadas explicitamente: o botocore não
+    percorre a cadeia de providers (shared config, IMDS...), e o probe do IMDS
+    sozinho pode levar 1-2 s fora do EC2.
+    """
+    import boto3
+
+    env = os.environ
+    if env.get("AWS_ACCESS_KEY_ID") and env.get("AWS_SECRET_ACCESS_KEY"):
+        return boto3.session.Session(
+            aws_access_key_id=env["AWS_ACCESS_KEY_ID"],
+            aws_secret_access_key=env["AWS_SECRET_ACCESS_KEY"],
+            aws_session_token=env.get("AWS_SESSION_TOKEN"),
+        )
+    return boto3.session.Session()
 
-    # Recomendação: no Windows, às vezes AWS_REGION é lido em vez de AWS_DEFAULT_REGION em certos setups
-    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "sa-east-1"
-    print(f"🌎 Região usada: {region}")
 
-    # Config com timeouts/retries melhores para diagnosticar
-    cfg = Config(
+@functools.lru_cache(maxsize=8)
+def _s3_config(region: str, connect_timeout: int = 3, read_timeout: int = 10,
+               max_attempts: int = 2, max_pool_connections: int = 50) -> "Config":
+    # Config construído uma vez por combinação de parâmetros e reaproveitado
+    # (Config.__init__ valida dezenas de campos); cacheado em vez de global no
+    # módulo para manter o import do botocore sob demanda.
+    from botocore.config import Config
+
+    # Config com timeouts/retries curtos para diagnosticar: falha de DNS/proxy
+    # aparece em poucos segundos em vez de ~90s (valores longos via --stress)
+    return Config(
         region_name=region,
-        connect_timeout=10,
-        read_timeout=20,
-        retries={"max_attempts": 3, "mode": "standard"},
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        # adaptive = standard + token bucket no cliente: ao receber SlowDown/503 o
+        # botocore reduz a taxa de envio em vez de disparar retries sincronizados.
+        # AWS_RETRY_MODE permite comparar legacy/standard/adaptive sem mexer no código.
+        retries={"max_attempts": max_attempts, "mode": os.getenv("AWS_RETRY_MODE", "adaptive")},
+        # default do botocore é 10: com threads reutilizando o client, o pool enche
+        # ("Connection pool is full, discarding connection") e refaz TCP+TLS a cada descarte
+        max_pool_connections=max_pool_connections,
+        # mantém as conexões do pool vivas entre chamadas (botocore >= 1.27.84)
+        tcp_keepalive=True,
+        # bucket no host (bucket.s3.<região>.amazonaws.com). Sem endpoint_url fixo:
+        # assim o redirect de região do botocore (301 PermanentRedirect) continua
+        # reenviando para a região certa do bucket.
+        s3={"addressing_style": "virtual"},
+        # checksums só quando a operação exige: sem hash por resposta na listagem
+        # paginada/paralela (botocore >= 1.36)
+        request_checksum_calculation="when_required",
+        response_checksum_validation="when_required",
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _get_s3(region: str, connect_timeout: int, read_timeout: int, max_attempts: int,
+            max_pool_connections: int):
+    """
+    Client S3 cacheado por (região, timeouts, retries, pool): chamadas repetidas
+    de test_s3 (ex.: health check em web handler) reaproveitam o mesmo pool
+    urllib3 e não refazem o handshake TLS.
+    """
+    cfg = _s3_config(region, connect_timeout, read_timeout, max_attempts, max_pool_connections)
+    return _get_session().client("s3", config=cfg)
+
+
+def iter_keys(s3, bucket: str, prefix: str = "", limit: Optional[int] = None) -> Iterator[str]:
+    """
+    Itera as keys sob `prefix` usando o paginator do ListObjectsV2
+    (continuation token automático, memória constante). Para em `limit` keys.
+    """
+    page_size = min(1000, limit) if limit else 1000
+    pages = s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket,
+        Prefix=prefix,
+        PaginationConfig={"PageSize": page_size, "MaxItems": limit},
+    )
+    n = 0
+    for page in pages:
+        for o in page.get("Contents", []):
+            yield o["Key"]
+            n += 1
+            if limit is not None and n >= limit:
+                return
+
+
+def iter_common_prefixes(s3, bucket: str, prefix: str = "", limit: Optional[int] = None) -> Iterator[str]:
+    """
+    Itera só os "diretórios" imediatamente abaixo de `prefix` (CommonPrefixes
+    com Delimiter="/"): o S3 agrupa as keys no servidor e a resposta não traz
+    um <Contents> por objeto. Use iter_keys quando precisar das keys-folha.
+    """
+    pages = s3.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket,
+        Prefix=prefix,
+        Delimiter="/",
+        PaginationConfig={"PageSize": 1000, "MaxItems": limit},
     )
+    n = 0
+    for page in pages:
+        for cp in page.get("CommonPrefixes", []):
+            yield cp["Prefix"]
+            n += 1
+            if limit is not None and n >= limit:
+                return
+
+
+def fetch_keys(s3, bucket: str, keys: Sequence[str], workers: int = 64) -> List[bytes]:
+    """
+    Baixa o conteúdo de várias keys com get_object concorrente (mesma ordem de `keys`).
+    Para objetos pequenos o custo é dominado pelo overhead por requisição; com
+    requisições em voo simultâneas esse RTT é sobreposto em vez de pago um a um.
+    workers é limitado ao max_pool_connections do client para não descartar conexões.
+    """
+    if not keys:
+        return []
+    workers = max(1, min(workers, len(keys), s3.meta.config.max_pool_connections))
+
+    def baixar(k: str) -> bytes:
+        return s3.get_object(Bucket=bucket, Key=k)["Body"].read()
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(baixar, keys))
+
+
+def _on_no_credentials(e: Exception) -> None:
+    log.error("❌ Credenciais não encontradas. Refaça os SET no CMD.")
+
+
+def _on_endpoint(e: Exception) -> None:
+    log.error("❌ Falha de conexão com o endpoint (rede/DNS/proxy/firewall).")
+    log.error("   Detalhe: %s", e)
+    log.info("➡️ Se você estiver em rede corporativa, configure HTTP(S)_PROXY ou tente em outra rede/VPN.")
+
+
+def _on_ssl(e: Exception) -> None:
+    log.error("❌ Erro SSL/TLS (muito comum com proxy corporativo / inspeção HTTPS).")
+    log.error("   Detalhe: %s", e)
+    log.info("➡️ Se houver proxy corporativo com inspeção, você precisa do proxy configurado no ambiente.")
+
+
+def _on_timeout(e: Exception) -> None:
+    log.error("❌ Timeout/Conexão fechada (instabilidade ou proxy).")
+    log.error("   Detalhe: %s", e)
+
+
+def _on_client_error(e: Exception) -> None:
+    code = e.response["Error"].get("Code")
+    msg = e.response["Error"].get("Message")
+    log.error("❌ ClientError: %s - %s", code, msg)
+    if code in ("AccessDenied", "Forbidden"):
+        log.info("➡️ Isso é IAM/policy: falta s3:ListBucket / s3:GetObject / s3:PutObject conforme sua necessidade.")
+    elif code in ("NoSuchBucket", "404"):
+        log.info("➡️ Nome do bucket errado ou bucket em outra conta/região.")
+
+
+def _on_unexpected(e: Exception) -> None:
+    log.error("❌ Erro inesperado: %r", e)
+
+
+@functools.lru_cache(maxsize=None)
+def _handlers() -> Dict[type, Callable[[Exception], None]]:
+    """Classe de exceção do botocore -> handler de diagnóstico (montado no 1º erro)."""
+    from botocore.exceptions import (
+        ClientError, ConnectionClosedError, EndpointConnectionError, NoCredentialsError,
+        ReadTimeoutError, SSLError,
+    )
+
+    return {
+        NoCredentialsError: _on_no_credentials,
+        EndpointConnectionError: _on_endpoint,
+        SSLError: _on_ssl,
+        ReadTimeoutError: _on_timeout,
+        ConnectionClosedError: _on_timeout,
+        ClientError: _on_client_error,
+    }
+
+
+def test_s3(bucket_name: str, prefix: str = "scr/",
+            max_pool_connections: int = int(os.getenv("S3_MAX_POOL", "50")),
+            verbose: bool = False, connect_timeout: int = 3, read_timeout: int = 10,
+            max_attempts: int = 2, prefixes: Optional[Sequence[str]] = None):
+    """
+    Diagnóstico de acesso ao S3. `prefix` lista um prefixo; `prefixes`
+    (opcional) lista vários em paralelo e, se informado, substitui `prefix`.
+    """
+    show_env()
+
+    # Recomendação: no Windows, às vezes AWS_REGION é lido em vez de AWS_DEFAULT_REGION em certos setups
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "sa-east-1"
+    log.info("🌎 Região usada: %s", region)
 
     try:
-        s3 = boto3.client("s3", config=cfg)
-
-        # 1) Teste básico de autenticação (não precisa de bucket)
-        sts = boto3.client("sts", config=cfg)
-        ident = sts.get_caller_identity()
-        print(f"✅ STS ok. Account={ident.get('Account')} Arn={ident.get('Arn')}")
-
-        # 2) Teste de acesso ao bucket
-        print(f"\n🔎 Testando head_bucket em: {bucket_name}")
-        s3.head_bucket(Bucket=bucket_name)
-        print("✅ head_bucket ok (bucket existe e você tem permissão).")
-
-        # 3) Listagem simples
-        print(f"\n📂 Listando até 5 objetos em Prefix='{prefix}':")
-        resp = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=5)
-        objs = resp.get("Contents", [])
-        if not objs:
-            print("⚠️ Nenhum objeto encontrado (ou prefix vazio).")
-        else:
-            for o in objs:
-                print(" -", o["Key"])
-
-        print("\n🎉 Conexão com S3 funcionando.")
-
-    except NoCredentialsError:
-        print("❌ Credenciais não encontradas. Refaça os SET no CMD.")
-    except EndpointConnectionError as e:
-        print("❌ Falha de conexão com o endpoint (rede/DNS/proxy/firewall).")
-        print(f"   Detalhe: {e}")
-        print("\n➡️ Se você estiver em rede corporativa, configure HTTP(S)_PROXY ou tente em outra rede/VPN.")
-    except SSLError as e:
-        print("❌ Erro SSL/TLS (muito comum com proxy corporativo / inspeção HTTPS).")
-        print(f"   Detalhe: {e}")
-        print("\n➡️ Se houver proxy corporativo com inspeção, você precisa do proxy configurado no ambiente.")
-    except (ReadTimeoutError, ConnectionClosedError) as e:
-        print("❌ Timeout/Conexão fechada (instabilidade ou proxy).")
-        print(f"   Detalhe: {e}")
-    except ClientError as e:
-        code = e.response["Error"].get("Code")
-        msg = e.response["Error"].get("Message")
-        print(f"❌ ClientError: {code} - {msg}")
-        if code in ("AccessDenied", "Forbidden"):
-            print("➡️ Isso é IAM/policy: falta s3:ListBucket / s3:GetObject / s3:PutObject conforme sua necessidade.")
-        elif code in ("NoSuchBucket",):
-            print("➡️ Nome do bucket errado ou bucket em outra conta/região.")
+        s3 = _get_s3(region, connect_timeout, read_timeout, max_attempts, max_pool_connections)
+
+        # 1) Teste básico de autenticação (não precisa de bucket).
+        # Só em modo verbose: é um round-trip/TLS extra e erros de credencial
+        # já aparecem como ClientError nas chamadas ao S3.
+        if verbose:
+            cfg = _s3_config(region, connect_timeout, read_timeout, max_attempts, max_pool_connections)
+            sts = _get_session().client("sts", config=cfg)
+            ident = sts.get_caller_identity()
+            log.info("✅ STS ok. Account=%s Arn=%s", ident.get("Account"), ident.get("Arn"))
+
+        # 2) Acesso ao bucket + listagem simples numa única chamada:
+        # ListObjectsV2 com sucesso já prova que o bucket existe e que há s3:ListBucket
+        # (dispensa o head_bucket); bucket inexistente cai em NoSuchBucket/404 abaixo.
+        # Vários prefixos (shards) são listados em paralelo com o mesmo client
+        # (clients boto3 são thread-safe); workers <= max_pool_connections para não
+        # estourar o pool de conexões.
+        if prefixes is None:
+            prefixes = [prefix]
+        elif isinstance(prefixes, str):
+            prefixes = [prefixes]
+        workers = max(1, min(32, len(prefixes), max_pool_connections))
+
+        def listar(p: str) -> List[str]:
+            return list(iter_keys(s3, bucket_name, p, limit=5))
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            resultados = list(ex.map(listar, prefixes))
+        log.info("✅ list_objects_v2 ok (bucket existe e você tem permissão).")
+
+        for p, keys in zip(prefixes, resultados):
+            log.info("📂 Até 5 objetos em %s, Prefix='%s':", bucket_name, p)
+            if not keys:
+                log.warning("⚠️ Nenhum objeto encontrado (ou prefix vazio).")
+            else:
+                for k in keys:
+                    log.info(" - %s", k)
+
+        log.info("🎉 Conexão com S3 funcionando.")
+
     except Exception as e:
-        print("❌ Erro inesperado:", repr(e))
+        handlers = _handlers()
+        # primeira classe da MRO com handler = except mais específico
+        handler = next((handlers[c] for c in type(e).__mro__ if c in handlers), _on_unexpected)
+        handler(e)
+
+async def test_s3_async(bucket_name: str, prefixes: Sequence[str], limit: int = 5,
+                        max_pool_connections: int = int(os.getenv("S3_MAX_POOL", "50")),
+                        connect_timeout: int = 3, read_timeout: int = 10,
+                        max_attempts: int = 2) -> Dict[str, List[str]]:
+    """
+    Versão assíncrona da listagem (aiobotocore): um único event loop mantém
+    todas as requisições em voo no mesmo pool, sem uma thread por prefixo.
+    Retorna {prefix: [keys]} (até `limit` keys por prefixo); erros sobem para o chamador.
+    """
+    from aiobotocore.session import get_session  # vem com o s3fs
+
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "sa-east-1"
+    cfg = _s3_config(region, connect_timeout, read_timeout, max_attempts, max_pool_connections)
+
+    async with get_session().create_client("s3", config=cfg) as s3:
+        resps = await asyncio.gather(*[
+            s3.list_objects_v2(Bucket=bucket_name, Prefix=p, MaxKeys=limit) for p in prefixes
+        ])
+    return {p: [o["Key"] for o in r.get("Contents", [])] for p, r in zip(prefixes, resps)}
+
 
 if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stress", action="store_true",
+                    help="Timeouts/retries longos (10s/20s, 5 tentativas) em vez do modo fail-fast.")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     BUCKET_NAME = "SEU_BUCKET_AQUI"
     PREFIX = "scr/"
-    test_s3(BUCKET_NAME, PREFIX)
+    if args.stress:
+        test_s3(BUCKET_NAME, PREFIX, connect_timeout=10, read_timeout=20, max_attempts=5)
+    else:
+        test_s3(BUCKET_NAME, PREFIX)